@@ -8,6 +8,7 @@ import logging
 import os
 import pickle
 
+from collections import deque
 from enum import Enum
 from typing import Final
 
@@ -24,10 +25,8 @@ _default_data: dict[str, any] = {
 class GuildData():
     ''' Class that holds all Discodrome data specific to a guild (not saved to disk) '''
     def __init__(self) -> None:
-        self._data = _default_data
+        self._data = _default_data.copy()
         self.player = Player()
-        if self.player.queue is None:
-            self.player.queue = []
 
     @property
     def player(self) -> Player:
@@ -52,7 +51,7 @@ def guild_data(guild_id: int) -> GuildData:
 
     # Load queue from disk if it exists
     if guild_properties(guild_id).queue is not None:
-        data.player.queue = guild_properties(guild_id).queue
+        data.player.queue = deque(guild_properties(guild_id).queue)
 
     _guild_data_instances[guild_id] = data
     return _guild_data_instances[guild_id]
@@ -74,7 +73,7 @@ _default_properties: dict[str, any] = {
 class GuildProperties():
     ''' Class that holds all Discodrome properties specific to a guild (saved to disk) '''
     def __init__(self) -> None:
-        self._properties = _default_properties
+        self._properties = _default_properties.copy()
 
     @property
     def autoplay_mode(self) -> AutoplayMode:
@@ -86,11 +85,11 @@ class GuildProperties():
         self._properties["autoplay-mode"] = value
 
     @property
-    def queue(self) -> list[Song]:
+    def queue(self) -> deque[Song]:
         return self._properties["queue"]
 
     @queue.setter
-    def queue(self, value: list[Song]) -> None:
+    def queue(self, value: deque[Song]) -> None:
         self._properties["queue"] = value
 
 
@@ -132,6 +131,10 @@ def load_guild_properties_from_disk() -> None:
     with open("guild_properties.pickle", "rb") as file:
         try:
             _guild_property_instances.update(pickle.load(file))
+
+            # Older saves shared a single properties dict between every guild, so give each guild its own copy
+            for properties in _guild_property_instances.values():
+                properties._properties = dict(properties._properties)
             logger.info("Guild properties loaded successfully.")
         except pickle.UnpicklingError as err:
             logger.error("Failed to load guild properties from disk.", exc_info=err)
@@ -63,6 +63,12 @@ class DiscodromeClient(commands.Bot):
         if self.test_guild:
             await self.sync_command_tree()
 
+    async def close(self) -> None:
+        ''' Closes the Subsonic API session along with the connection to Discord. '''
+
+        await close_session()
+        await super().close()
+
     async def on_ready(self) -> None:
         ''' Event called when the client is done preparing. '''
 
@@ -1,19 +1,51 @@
 import discord
 import logging
 import asyncio
+import random
+import time
 from discord import app_commands
 from discord.ext import commands
 
-from random import randint 
 import data
-import copy
 import subsonic
-import ui
+from ui import ErrMsg, SysMsg
 
 from discodrome import DiscodromeClient
+from util import cache
+from util import env
 
 logger = logging.getLogger(__name__)
 
+# Maximum length of the text rendered into a single list embed (leaves room for the "And N more..." suffix)
+_EMBED_OUTPUT_LIMIT = 4083
+
+# How long a playlist name → id mapping is trusted before being fetched again, in seconds
+_PLAYLIST_ID_CACHE_TTL = 300
+
+# Minimum time between disconnecting from and reconnecting to a guild's voice channel, in seconds
+_RECONNECT_COOLDOWN = 1.0
+
+# Autoplay modes selectable through the /autoplay command, by choice value
+_AUTOPLAY_MODE_MAP: dict[str, data.AutoplayMode] = {
+    "none": data.AutoplayMode.NONE,
+    "random": data.AutoplayMode.RANDOM,
+    "similar": data.AutoplayMode.SIMILAR,
+}
+
+@cache.async_ttl_cache(env.SUBSONIC_CACHE_TTL)
+async def cached_get_user_playlists() -> list[dict]:
+    ''' Returns the user's playlists, reusing a recent response from the Subsonic API if available '''
+    return await subsonic.get_user_playlists()
+
+@cache.async_ttl_cache(env.SUBSONIC_CACHE_TTL, key=lambda artist: artist.lower())
+async def cached_get_artist_discography(artist: str) -> list[subsonic.Album]:
+    ''' Returns an artist's discography, reusing a recent response from the Subsonic API if available '''
+    return await subsonic.get_artist_discography(artist)
+
+def _has_listeners(channel: discord.VoiceChannel) -> bool:
+    ''' Returns whether any human user is connected to the given voice channel '''
+    return any(not member.bot for member in channel.members)
+
 class MusicCog(commands.Cog):
     ''' A Cog containing music playback commands '''
 
@@ -21,53 +53,106 @@ class MusicCog(commands.Cog):
 
     def __init__(self, bot: DiscodromeClient):
         self.bot = bot
+        self._playlist_ids: dict[str, str] = {}
+        self._playlist_ids_expiry: float = 0.0
+        self._last_disconnect: dict[int, float] = {}
+        self._vc_by_guild: dict[int, discord.VoiceClient] = {}
+        self._idle_disconnect_tasks: dict[int, asyncio.Task] = {}
 
     async def get_voice_client(self, interaction: discord.Interaction, *, should_connect: bool=False) -> discord.VoiceClient:
         ''' Returns a voice client instance for the current guild '''
 
-        # Get the voice client for the guild
-        voice_client = discord.utils.get(self.bot.voice_clients, guild=interaction.guild)
+        # Get the voice client for the guild, falling back to discord.py's own list if ours has gone stale
+        voice_client = self._vc_by_guild.get(interaction.guild_id)
+        if voice_client is None or not voice_client.is_connected():
+            self._vc_by_guild.pop(interaction.guild_id, None)
+            voice_client = discord.utils.get(self.bot.voice_clients, guild=interaction.guild)
+            if voice_client is not None:
+                self._vc_by_guild[interaction.guild_id] = voice_client
+                data.guild_data(interaction.guild_id).player.voice_client = voice_client
 
         # Connect to a voice channel
         if voice_client is None and should_connect:
             try:
                 # Check if user is in a voice channel
                 if interaction.user.voice is None or interaction.user.voice.channel is None:
-                    await ui.ErrMsg.user_not_in_voice_channel(interaction)
+                    await ErrMsg.user_not_in_voice_channel(interaction)
                     return None
                 
                 # Check if we have permission to join the voice channel
                 permissions = interaction.user.voice.channel.permissions_for(interaction.guild.me)
                 if not permissions.connect or not permissions.speak:
                     logger.error("Missing permissions to connect or speak in voice channel")
-                    await ui.ErrMsg.msg(interaction, "I don't have permission to join or speak in your voice channel.")
+                    await ErrMsg.msg(interaction, "I don't have permission to join or speak in your voice channel.")
                     return None
                 
-                # Add a small delay before connecting to avoid potential race conditions
-                await asyncio.sleep(1)
+                # If we only just disconnected from this guild, wait out the remainder of the cooldown to avoid potential race conditions
+                elapsed = time.monotonic() - self._last_disconnect.get(interaction.guild_id, 0.0)
+                if elapsed < _RECONNECT_COOLDOWN:
+                    await asyncio.sleep(_RECONNECT_COOLDOWN - elapsed)
                 
                 # Connect with timeout and retry logic
                 try:
                     voice_client = await interaction.user.voice.channel.connect(timeout=10.0, reconnect=True)
-                    logger.info(f"Successfully connected to voice channel {interaction.user.voice.channel.id}")
+                    self._vc_by_guild[interaction.guild_id] = voice_client
+                    data.guild_data(interaction.guild_id).player.voice_client = voice_client
+                    logger.info("Successfully connected to voice channel %s", interaction.user.voice.channel.id)
                 except asyncio.TimeoutError:
                     logger.error("Timeout while connecting to voice channel")
-                    await ui.ErrMsg.msg(interaction, "Timed out while trying to connect to voice channel. Please try again.")
+                    await ErrMsg.msg(interaction, "Timed out while trying to connect to voice channel. Please try again.")
                     return None
                 except discord.ClientException as e:
-                    logger.error(f"Client exception when connecting to voice: {e}")
-                    await ui.ErrMsg.msg(interaction, f"Error connecting to voice channel: {e}")
+                    logger.error("Client exception when connecting to voice: %s", e)
+                    await ErrMsg.msg(interaction, f"Error connecting to voice channel: {e}")
                     return None
                 
             except AttributeError as e:
-                logger.error(f"Attribute error when connecting to voice: {e}")
-                await ui.ErrMsg.cannot_connect_to_voice_channel(interaction)
+                logger.error("Attribute error when connecting to voice: %s", e)
+                await ErrMsg.cannot_connect_to_voice_channel(interaction)
             except Exception as e:
-                logger.error(f"Unexpected error when connecting to voice: {e}")
-                await ui.ErrMsg.msg(interaction, f"An unexpected error occurred while connecting to voice: {e}")
+                logger.error("Unexpected error when connecting to voice: %s", e)
+                await ErrMsg.msg(interaction, f"An unexpected error occurred while connecting to voice: {e}")
                 
         return voice_client
 
+    async def _handle_error(self, ctx: discord.Interaction, error: app_commands.AppCommandError, operation: str) -> None:
+        ''' Logs an error raised by a command and lets the user know something went wrong '''
+
+        # Errors raised inside a command arrive wrapped in a CommandInvokeError
+        error = getattr(error, "original", error)
+
+        if isinstance(error, subsonic.APIError):
+            logger.error("An API error has occurred while %s, code %s: %s", operation, error.errorcode, error.message)
+            await ErrMsg.msg(ctx, "An API error has occurred and has been logged to console. Please contact an administrator.")
+        else:
+            logger.error("An error occurred while %s: %s", operation, error, exc_info=error)
+            await ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+
+    async def get_playlist_id(self, name: str) -> str:
+        ''' Returns the id of the user's playlist with the given name, or None if it doesn't exist '''
+
+        # Use our cached name → id mapping if it's still fresh
+        if time.monotonic() < self._playlist_ids_expiry and name in self._playlist_ids:
+            return self._playlist_ids[name]
+
+        # Otherwise rebuild it; if the name is still unknown the cached playlist list may predate it, so ask the server once more
+        for _ in range(2):
+            playlists = await cached_get_user_playlists()
+            if playlists == None:
+                return None
+
+            # If several playlists share a name, the first one listed wins
+            self._playlist_ids = {}
+            for playlist in playlists:
+                self._playlist_ids.setdefault(playlist["name"], playlist["id"])
+            self._playlist_ids_expiry = time.monotonic() + _PLAYLIST_ID_CACHE_TTL
+            if name in self._playlist_ids:
+                return self._playlist_ids[name]
+
+            cached_get_user_playlists.cache_clear()
+
+        return None
+
     @app_commands.command(name="play", description="Plays a specified track, album or playlist")
     @app_commands.describe(querytype="Whether what you're searching is a track, album or playlist", query="Enter a search query")
     @app_commands.choices(querytype=[
@@ -80,34 +165,37 @@ class MusicCog(commands.Cog):
 
         # Check if user is in voice channel
         if interaction.user.voice is None:
-            return await ui.ErrMsg.user_not_in_voice_channel(interaction)
+            return await ErrMsg.user_not_in_voice_channel(interaction)
 
         # Get a valid voice channel connection
         voice_client = await self.get_voice_client(interaction, should_connect=True)
+        if voice_client is None:
+            return
 
         # Don't attempt playback if the bot is already playing
         if voice_client.is_playing() and query is None:
-            return await ui.ErrMsg.already_playing(interaction)
+            return await ErrMsg.already_playing(interaction)
 
-# Get the guild's player
-        player = data.guild_data(interaction.guild_id).player
-        player.announce_channel = interaction.channel   # ← THIS LINE, 8 spaces before it
+        # Get the guild's player
+        gid = interaction.guild_id
+        player = data.guild_data(gid).player
+        player.announce_channel = interaction.channel
 
         # Check queue if no query is provided
         if query is None:
 
             # Display error if queue is empty & autoplay is disabled
-            if player.queue == [] and data.guild_properties(interaction.guild_id).autoplay_mode == data.AutoplayMode.NONE:
-                return await ui.ErrMsg.queue_is_empty(interaction)
+            if not player.queue and data.guild_properties(gid).autoplay_mode == data.AutoplayMode.NONE:
+                return await ErrMsg.queue_is_empty(interaction)
 
             # Begin playback of queue
-            await ui.SysMsg.starting_queue_playback(interaction)
-            await player.play_audio_queue(interaction, voice_client)
+            await SysMsg.starting_queue_playback(interaction)
+            await player.play_audio_queue(interaction)
             return
 
         # Check querytype is not blank
         if querytype is None:
-            return await ui.ErrMsg.msg(interaction, "Please provide a query type.")
+            return await ErrMsg.msg(interaction, "Please provide a query type.")
 
         # Check if the query is a track
         if querytype == "track":
@@ -115,74 +203,61 @@ class MusicCog(commands.Cog):
             # Send our query to the subsonic API and retrieve a list of 1 song
             songs = await subsonic.search(query, artist_count=0, album_count=0, song_count=1)
             if songs == "Error":
-                await ui.ErrMsg.msg(interaction, f"An api error has occurred and has been logged to console. Please contact an administrator.")
+                await ErrMsg.msg(interaction, f"An api error has occurred and has been logged to console. Please contact an administrator.")
                 return
 
             # Display an error if the query returned no results
             if len(songs) == 0:
-                await ui.ErrMsg.msg(interaction, f"No track found for **{query}**.")
+                await ErrMsg.msg(interaction, f"No track found for **{query}**.")
                 return
             
             # Add the first result to the queue and handle queue playback
             player.queue.append(songs[0])
 
-            await ui.SysMsg.added_to_queue(interaction, songs[0])
+            await SysMsg.added_to_queue(interaction, songs[0])
 
         elif querytype == "album":
 
             # Send query to subsonic API and retrieve a list of 1 album
             album = await subsonic.search_album(query)
             if album == None:
-                await ui.ErrMsg.msg(interaction, f"No album found for **{query}**.")
+                await ErrMsg.msg(interaction, f"No album found for **{query}**.")
                 return
             
             # Add all songs from the album to the queue
-            for song in album.songs:
-                player.queue.append(song)
+            player.queue.extend(album.songs)
             
-            await ui.SysMsg.added_album_to_queue(interaction, album)
+            await SysMsg.added_album_to_queue(interaction, album)
 
         elif querytype == "playlist":
 
-            # Send query to subsonic API and retrieve a list of all playlists
-            playlists = await subsonic.get_user_playlists()
-            if playlists == None:
-                await ui.ErrMsg.msg(interaction, f"No playlists found.")
-                return
-            
+            # Look up the id of the playlist with the given name
+            playlist_id = await self.get_playlist_id(query)
+
             # Check if the specific playlist exists and get it's contents
-            playlist = None
-            playlist_id = None
-            for playlist in playlists:
-                if playlist["name"] == query:
-                    playlist_id = playlist["id"]
-                    break
             if playlist_id == None:
-                await ui.ErrMsg.msg(interaction, f"No playlist found for **{query}**.")
+                await ErrMsg.msg(interaction, f"No playlist found for **{query}**.")
                 return
             else:
                 playlist = await subsonic.get_playlist(playlist_id)
             if playlist == None:
+                # The cached id may point at a playlist that no longer exists, so force a refresh next time
+                self._playlist_ids_expiry = 0.0
+                cached_get_user_playlists.cache_clear()
                 # If we end up here then the following error message doesn't really cover it... It's more likely an error in this code
-                await ui.ErrMsg.msg(interaction, f"No playlist found for **{query}**.")
+                await ErrMsg.msg(interaction, f"No playlist found for **{query}**.")
                 return
             
             # Add all songs from the playlist to the queue
-            for song in playlist.songs:
-                player.queue.append(song)
+            player.queue.extend(playlist.songs)
             
-            await ui.SysMsg.added_playlist_to_queue(interaction, playlist)
+            await SysMsg.added_playlist_to_queue(interaction, playlist)
 
-        await player.play_audio_queue(interaction, voice_client)
+        await player.play_audio_queue(interaction)
 
     @play.error
     async def play_error(self, ctx, error):
-        if isinstance(error, subsonic.APIError):
-            logging.error(f"An API error has occurred playing a track, code {error.code}: {error.message}")
-            await ui.ErrMsg.msg(ctx, "An API error has occurred and has been logged to console. Please contact an administrator.")
-        else:
-            logging.error(f"An error occurred while playing a track: {error}")
-            await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "playing a track")
 
 
     @app_commands.command(name="stop", description="Stop playing the current track")
@@ -192,68 +267,68 @@ class MusicCog(commands.Cog):
         player = data.guild_data(interaction.guild_id).player
 
         if player.current_song is None:
-            ui.ErrMsg.not_playing(interaction)
+            ErrMsg.not_playing(interaction)
 
         # Get the voice client instance for the current guild
         voice_client = await self.get_voice_client(interaction)
 
         # Check if our voice client is connected
         if voice_client is None:
-            await ui.ErrMsg.bot_not_in_voice_channel(interaction)
+            await ErrMsg.bot_not_in_voice_channel(interaction)
             return
 
-        # Stop playback
-        voice_client.stop()
-
-        player.current_song = None
-        
-        # Add current song back to the queue if exists
-        player.queue.insert(0, player.current_song)
+        # Stop playback, putting the current song back at the front of the queue
+        player.stop()
 
         # Display disconnect confirmation
-        await ui.SysMsg.stopping_queue_playback(interaction)
+        await SysMsg.stopping_queue_playback(interaction)
 
     @stop.error
     async def stop_error(self, ctx, error):
-        logging.error(f"An error occurred while stopping playback: {error}")
-        await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "stopping playback")
 
     @app_commands.command(name="queue", description="View the current queue")
     async def show_queue(self, interaction: discord.Interaction) -> None:
         ''' Show the current queue '''
 
         # Get the audio queue for the current guild
-        queue = data.guild_data(interaction.guild_id).player.queue
+        player = data.guild_data(interaction.guild_id).player
+        queue = player.queue
+        current_song = player.current_song
+
+        # Nothing to render if nothing is playing or queued
+        if current_song is None and not queue:
+            return await SysMsg.msg(interaction, "Queue", "Queue is empty!")
 
-        # Create a string to store the output of our queue
-        output = ""
+        # Collect the lines of our output, tracking their total length as we go
+        parts: list[str] = []
+        total = 0
 
         # Add currently playing song to output if available
-        if data.guild_data(interaction.guild_id).player.current_song is not None:
-            song = data.guild_data(interaction.guild_id).player.current_song
-            output += f"**Now Playing:**\n{song.title} - *{song.artist}*\n{song.album} ({song.duration_printable})\n\n"
+        if current_song is not None:
+            song = current_song
+            strtoadd = f"**Now Playing:**\n{song.title} - *{song.artist}*\n{song.album} ({song.duration_printable})\n\n"
+            parts.append(strtoadd)
+            total += len(strtoadd)
 
-        # Loop over our queue, adding each song into our output string
+        # Loop over our queue, adding each song into our output
         for i, song in enumerate(queue):
             strtoadd = f"{i+1}. **{song.title}** - *{song.artist}*\n{song.album} ({song.duration_printable})\n\n"
-            if len(output+strtoadd) < 4083:
-                output += strtoadd
+            length = len(strtoadd)
+            if total + length < _EMBED_OUTPUT_LIMIT:
+                parts.append(strtoadd)
+                total += length
             else:
                 remaining = len(queue) - i
-                output += f"**And {remaining} more...**"
+                parts.append(f"**And {remaining} more...**")
                 break
 
-        # Check if our output string is empty & update it accordingly
-        if output == "":
-            output = "Queue is empty!"
-
         # Show the user their queue
-        await ui.SysMsg.msg(interaction, "Queue", output)
+        await SysMsg.msg(interaction, "Queue", "".join(parts))
 
     @show_queue.error
     async def show_queue_error(self, ctx, error):
-        logging.error(f"An error occurred while displaying the queue: {error}")
-        await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "displaying the queue")
 
     @app_commands.command(name="clear", description="Clear the current queue")
     async def clear_queue(self, interaction: discord.Interaction) -> None:
@@ -262,12 +337,11 @@ class MusicCog(commands.Cog):
         queue.clear()
 
         # Let the user know that the queue has been cleared
-        await ui.SysMsg.queue_cleared(interaction)
+        await SysMsg.queue_cleared(interaction)
 
     @clear_queue.error
     async def clear_queue_error(self, ctx, error):
-        logging.error(f"An error occurred while clearing the queue: {error}")
-        await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "clearing the queue")
 
 
     @app_commands.command(name="skip", description="Skip the current track")
@@ -279,20 +353,19 @@ class MusicCog(commands.Cog):
 
         # Check if the bot is connected to a voice channel
         if voice_client is None:
-            await ui.ErrMsg.bot_not_in_voice_channel(interaction)
+            await ErrMsg.bot_not_in_voice_channel(interaction)
             return
 
         # Check if the bot is playing music
         if not voice_client.is_playing():
-            await ui.ErrMsg.not_playing(interaction)
+            await ErrMsg.not_playing(interaction)
             return
 
-        await data.guild_data(interaction.guild_id).player.skip_track(interaction, voice_client)
+        await data.guild_data(interaction.guild_id).player.skip_track(interaction)
 
     @skip.error
     async def skip_error(self, ctx, error):
-        logging.error(f"An error occurred while skipping a track: {error}")
-        await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "skipping a track")
 
     @app_commands.command(name="autoplay", description="Toggles autoplay")
     @app_commands.describe(mode="Determines the method to use when autoplaying")
@@ -304,65 +377,49 @@ class MusicCog(commands.Cog):
     async def autoplay(self, interaction: discord.Interaction, mode: app_commands.Choice[str]) -> None:
         ''' Toggles autoplay '''
 
-        logger.debug(f"Autoplay mode: {mode.value}")
+        logger.debug("Autoplay mode: %s", mode.value)
+        gid = interaction.guild_id
+
         # Update the autoplay properties
-        match mode.value:
-            case "none":
-                data.guild_properties(interaction.guild_id).autoplay_mode = data.AutoplayMode.NONE
-            case "random":
-                data.guild_properties(interaction.guild_id).autoplay_mode = data.AutoplayMode.RANDOM
-            case "similar":
-                data.guild_properties(interaction.guild_id).autoplay_mode = data.AutoplayMode.SIMILAR
+        data.guild_properties(gid).autoplay_mode = _AUTOPLAY_MODE_MAP[mode.value]
 
         # Display message indicating new status of autoplay
         if mode.value == "none":
-            await ui.SysMsg.msg(interaction, f"Autoplay disabled by {interaction.user.display_name}")
+            await SysMsg.msg(interaction, f"Autoplay disabled by {interaction.user.display_name}")
         else:
-            await ui.SysMsg.msg(interaction, f"Autoplay enabled by {interaction.user.display_name}", f"Autoplay mode: **{mode.name}**")
+            await SysMsg.msg(interaction, f"Autoplay enabled by {interaction.user.display_name}", f"Autoplay mode: **{mode.name}**")
 
 
         # If the bot is connected to a voice channel and autoplay is enabled, start queue playback
         voice_client = await self.get_voice_client(interaction)
-        logger.debug(f"Voice client: {voice_client}")
-        if voice_client:
-            logger.debug(f"Is playing: {voice_client.is_playing()}")
-        if voice_client is not None and not voice_client.is_playing():        
-            player = data.guild_data(interaction.guild_id).player
+        logger.debug("Voice client: %s", voice_client)
+        if voice_client is not None and not voice_client.is_playing():
+            player = data.guild_data(gid).player
 
-            logger.debug(f"Queue: {player.queue}")
-            try:
-                logger.debug(f"Current song: {player.current_song.title}")
-            except AttributeError:
-                logger.debug("No current song")
-                
+            logger.debug("Queue: %s", player.queue)
+            logger.debug("Current song: %s", getattr(player.current_song, "title", None))
             logger.debug("Playing audio queue...")
-            await player.play_audio_queue(interaction, voice_client)
+            await player.play_audio_queue(interaction)
         
     @autoplay.error
     async def autoplay_error(self, ctx, error):
-        if isinstance(error, subsonic.APIError):
-            logging.error(f"An API error has occurred while toggling autoplay, code {error.code}: {error.message}")
-            await ui.ErrMsg.msg(ctx, "An API error has occurred and has been logged to console. Please contact an administrator.")
-        else:
-            logging.error(f"An error occurred while toggling autoplay: {error}")
-            await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "toggling autoplay")
 
     @app_commands.command(name="shuffle", description="Shuffles the current queue")
     async def shuffle(self, interaction: discord.Interaction):
-        ''' Randomize current queue using Fisher-Yates algorithm '''
-        temporaryqueue = copy.deepcopy(data.guild_data(interaction.guild_id).player.queue)
-        shuffledqueue = []
-        while len(temporaryqueue) > 0:
-            randomindex = randint(0, len(temporaryqueue) - 1)
-            shuffledqueue.append(temporaryqueue.pop(randomindex))
-        
-        data.guild_data(interaction.guild_id).player.queue = shuffledqueue
-        await ui.SysMsg.msg(interaction, "Queue shuffled!")
+        ''' Randomize current queue in place using Fisher-Yates algorithm '''
+        queue = data.guild_data(interaction.guild_id).player.queue
+
+        # Shuffle a list copy, since indexing into the middle of a deque isn't constant time
+        songs = list(queue)
+        random.shuffle(songs)
+        queue.clear()
+        queue.extend(songs)
+        await SysMsg.msg(interaction, "Queue shuffled!")
 
     @shuffle.error
     async def shuffle_error(self, ctx, error):
-        logging.error(f"An error occurred while shuffling the queue: {error}")
-        await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "shuffling the queue")
 
     @app_commands.command(name="disco", description="Plays the artist's entire discography")
     @app_commands.describe(artist="The artist to play")
@@ -371,102 +428,135 @@ class MusicCog(commands.Cog):
 
         # Get a valid voice channel connection
         voice_client = await self.get_voice_client(interaction, should_connect=True)
+        if voice_client is None:
+            return
 
         # Get the guild's player
         player = data.guild_data(interaction.guild_id).player
 
         # Send our query to the subsonic API and retrieve list of albums in artist's discography
-        albums = await subsonic.get_artist_discography(artist)
+        albums = await cached_get_artist_discography(artist)
         if albums == None:
-            await ui.ErrMsg.msg(interaction, f"No discography found for **{artist}**.")
+            await ErrMsg.msg(interaction, f"No discography found for **{artist}**.")
             return
         
         # Add all songs from the artist's discography to the queue
         for album in albums:
-            for song in album.songs:
-                player.queue.append(song)
+            player.queue.extend(album.songs)
         
         # Display a message that discography was added to the queue
-        await ui.SysMsg.added_discography_to_queue(interaction, artist, albums)
+        await SysMsg.added_discography_to_queue(interaction, artist, albums)
 
         # Begin playback of queue
-        await player.play_audio_queue(interaction, voice_client)
+        await player.play_audio_queue(interaction)
 
     @disco.error
     async def disco_error(self, ctx, error):
-        if isinstance(error, subsonic.APIError):
-            logging.error(f"An API error has occurred while playing an artist's discography, code {error.code}: {error.message}")
-            await ui.ErrMsg.msg(ctx, "An API error has occurred and has been logged to console. Please contact an administrator.")
-        else:
-            logging.error(f"An error occurred while playing an artist's discography: {error}")
-            await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "playing an artist's discography")
 
 
     @app_commands.command(name="playlists", description="List all playlists")
     async def list_playlists(self, interaction):
         # Send query to subsonic API and retrieve a list of all playlists
-        playlists = await subsonic.get_user_playlists()
+        playlists = await cached_get_user_playlists()
         if playlists == None:
-            await ui.ErrMsg.msg(interaction, f"No playlists found.")
+            await ErrMsg.msg(interaction, f"No playlists found.")
             return
 
-        # Create a string to store the output
-        output = ""
+        # Collect the lines of our output, tracking their total length as we go
+        parts: list[str] = []
+        total = 0
 
-        # Loop over the list of playlists, adding each one into our output string
+        # Loop over the list of playlists, adding each one into our output
         for i, playlist in enumerate(playlists):
-            strtoadd = f"{i+1}. **{playlist['name']}** \n{playlist['songCount']} songs - {(playlist['duration'] // 60):02d}m {(playlist['duration'] % 60):02d}s\n\n"
-            if len(output+strtoadd) < 4083:
-                output += strtoadd
+            strtoadd = f"{i+1}. **{playlist['name']}** \n{playlist['songCount']} songs - {playlist['duration_printable']}\n\n"
+            length = len(strtoadd)
+            if total + length < _EMBED_OUTPUT_LIMIT:
+                parts.append(strtoadd)
+                total += length
             else:
                 remaining = len(playlists) - i
-                output += f"**And {remaining} more...**"
+                parts.append(f"**And {remaining} more...**")
                 break
 
-        # Check if our output string is empty & update it accordingly
-        if output == "":
-            output = "No playlists found."
+        # Check if our output is empty & update it accordingly
+        output = "".join(parts) if parts else "No playlists found."
 
         # Show the user their queue
-        await ui.SysMsg.msg(interaction, "Available playlists", output)
+        await SysMsg.msg(interaction, "Available playlists", output)
 
     @list_playlists.error
     async def playlists_error(self, ctx, error):
-        if isinstance(error, subsonic.APIError):
-            logging.error(f"An API error has occurred while fetching playlists, code {error.code}: {error.message}")
-            await ui.ErrMsg.msg(ctx, "An API error has occurred and has been logged to console. Please contact an administrator.")
-        else:
-            logging.error(f"An error occurred while fetching playlists: {error}")
-            await ui.ErrMsg.msg(ctx, f"An unknown error has occurred and has been logged to console. Please contact an administrator. {error}")
+        await self._handle_error(ctx, error, "fetching playlists")
 
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState) -> None:
         ''' Event called when a user's voice state changes '''
 
-        # Check if the bot is connected to a voice channel
-        voice_client = discord.utils.get(self.bot.voice_clients, guild=member.guild)
+        # Ignore mute, deafen & stream toggles; only channel changes can leave the bot alone
+        if before.channel == after.channel:
+            return
+
+        guild = member.guild
+
+        # Forget our voice client once the bot has left the guild's voice channel
+        if member.id == self.bot.user.id and after.channel is None:
+            self._vc_by_guild.pop(guild.id, None)
+            data.guild_data(guild.id).player.voice_client = None
+
+            # A pending idle disconnect belongs to the old connection, and mustn't act on a new one
+            pending_task = self._idle_disconnect_tasks.pop(guild.id, None)
+            if pending_task is not None:
+                pending_task.cancel()
 
         # Check if the bot is connected to a voice channel
+        voice_client = self._vc_by_guild.get(guild.id)
         if voice_client is None:
             return
 
-        # Check if the bot is alone in the voice channel
-        if len(voice_client.channel.members) == 1:
+        # Ignore users moving between channels the bot isn't in
+        if before.channel != voice_client.channel and after.channel != voice_client.channel:
+            return
+
+        # Check if the bot is alone (or only with other bots) in the voice channel, restarting the disconnect countdown if so
+        pending_task = self._idle_disconnect_tasks.pop(guild.id, None)
+        if not _has_listeners(voice_client.channel):
+            if pending_task is not None:
+                pending_task.cancel()
             logger.debug("Bot is alone in voice channel, waiting 10 seconds before disconnecting...")
-            # Wait for 10 seconds
-            await asyncio.sleep(10)
-            
-            # Check again if there are still no users in the voice channel
-            if len(voice_client.channel.members) == 1:
-                # Disconnect the bot and clear the queue
-                await voice_client.disconnect()
-                player = data.guild_data(member.guild.id).player
-                player.queue.clear()
-                player.current_song = None
-                logger.info("The bot has disconnected and cleared the queue as there are no users in the voice channel.")
-            else:
-                logger.debug("Bot is no longer alone in voice channel, aborting disconnect...")
+            self._idle_disconnect_tasks[guild.id] = asyncio.create_task(self._disconnect_if_idle(guild.id, voice_client))
+        elif pending_task is not None and not pending_task.done():
+            pending_task.cancel()
+            logger.debug("Bot is no longer alone in voice channel, aborting disconnect...")
+
+    async def _disconnect_if_idle(self, guild_id: int, voice_client: discord.VoiceClient) -> None:
+        ''' Disconnects from voice and clears the guild's queue if the bot is still alone after a short wait '''
+
+        # Wait for 10 seconds
+        await asyncio.sleep(10)
+
+        # Clear our pending task; the disconnect below should not be cancelled by the voice state update it causes
+        if self._idle_disconnect_tasks.get(guild_id) is asyncio.current_task():
+            del self._idle_disconnect_tasks[guild_id]
+
+        # Make sure the voice client we were waiting on is still the guild's active connection
+        if self._vc_by_guild.get(guild_id) is not voice_client or not voice_client.is_connected():
+            return
+
+        # Check again if there are still no users in the voice channel
+        if not _has_listeners(voice_client.channel):
+            # Disconnect the bot and clear the queue
+            await voice_client.disconnect()
+            self._vc_by_guild.pop(guild_id, None)
+            self._last_disconnect[guild_id] = time.monotonic()
+            player = data.guild_data(guild_id).player
+            player.voice_client = None
+            player.queue.clear()
+            player.current_song = None
+            logger.info("The bot has disconnected and cleared the queue as there are no users in the voice channel.")
+        else:
+            logger.debug("Bot is no longer alone in voice channel, aborting disconnect...")
 
 async def setup(bot: DiscodromeClient):
     ''' Setup function for the music.py cog '''
@@ -1,7 +1,14 @@
 ''' A player object that handles playback and data for its respective guild '''
 
+import aiohttp
 import asyncio
 import discord
+import functools
+import random
+import time
+import weakref
+
+from collections import deque
 
 import data
 import ui
@@ -11,64 +18,156 @@ from subsonic import Song, APIError, get_random_songs, get_similar_songs, stream
 
 logger = logging.getLogger(__name__)
 
-# Default player data
-_default_data: dict[str, any] = {
-    "current-song": None,
-    "current-position": 0,
-    "queue": [],
-}
+# How long before the current song ends to fetch the next song's stream URL, in seconds
+_PREFETCH_LEAD_TIME = 30
+
+# How long before the current song ends to start FFmpeg for the next song, in seconds; kept short, since
+# FFmpeg stalls on a full pipe (holding the server's stream open) until the source is actually played
+_FFMPEG_WARMUP_LEAD_TIME = 2
+
+# How long a prefetched stream URL is trusted before it must be requested again, in seconds
+_PREFETCH_MAX_AGE = 60
+
+# Options passed to FFmpeg for streamed tracks; discord.py only reads these, so they can be shared
+_FFMPEG_OPTIONS = {"before_options": "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
+                   "options": "-filter:a volume=replaygain=track"}
+
+@functools.cache
+def _autoplay_fetchers() -> dict:
+    ''' Returns the coroutines that fetch an autoplay song for each autoplay mode, given the previous song's ID '''
+
+    # Built on first use, since data is still mid-import when this module is loaded
+    return {
+        data.AutoplayMode.RANDOM: lambda prev_song_id: get_random_songs(size=1),
+        data.AutoplayMode.SIMILAR: lambda prev_song_id: get_similar_songs(song_id=prev_song_id, count=1),
+    }
 
 class Player():
     ''' Class that represents an audio player '''
+
+    __slots__ = ("current_song", "current_position", "queue", "player_loop", "announce_channel", "_prefetch_task", "_prefetched_source", "_queue_lock", "_playback_tasks", "_voice_client", "_stopped")
+
     def __init__(self) -> None:
-        self._data = _default_data  
-        self._player_loop = None
-        self.announce_channel: discord.TextChannel | None = None
+        self.current_song: Song | None = None                       # The current song
+        self.current_position: int = 0                              # The current position for the current song, in seconds
+        self.queue: deque[Song] = deque()                           # The current audio queue
+        self.player_loop: asyncio.AbstractEventLoop | None = None   # The player loop
+        self.announce_channel: discord.TextChannel | None = None    # The channel used for background announcements
+        self._prefetch_task: asyncio.Task | None = None
+        self._prefetched_source: tuple[str, str, discord.FFmpegOpusAudio | None, float] | None = None   # (song id, stream url, audio source, time fetched)
+        self._queue_lock = asyncio.Lock()                           # Ensures only one coroutine advances the queue at a time
+        self._playback_tasks: set[asyncio.Task] = set()             # References to pending playback_finished tasks, so they aren't garbage collected
+        self._voice_client: weakref.ref[discord.VoiceClient] | None = None
+        self._stopped: bool = False                                 # Set by a manual stop, so the finished track doesn't advance the queue
 
     @property
-    def current_song(self) -> Song:
-        '''The current song'''
-        return self._data["current-song"]
+    def voice_client(self) -> discord.VoiceClient | None:
+        ''' The voice client used for playback, or None if the bot isn't connected '''
+        return self._voice_client() if self._voice_client is not None else None
 
-    @current_song.setter
-    def current_song(self, song: Song) -> None:
-        self._data["current-song"] = song
+    @voice_client.setter
+    def voice_client(self, voice_client: discord.VoiceClient | None) -> None:
+        # Only hold a weak reference, so a disconnected client isn't kept alive by the player
+        self._voice_client = weakref.ref(voice_client) if voice_client is not None else None
 
-    @property
-    def current_position(self) -> int:
-        ''' The current position for the current song, in seconds. '''
-        return self._data["current-position"]
+        # A prefetched source is of no use once we've left the voice channel
+        if voice_client is None:
+            self._cancel_prefetch()
+            self._discard_prefetched_source()
 
-    @current_position.setter
-    def current_position(self, position: int) -> None:
-        ''' Set the current position for the current song, in seconds. '''
-        self._data["current-position"] = position
+    @staticmethod
+    def _create_audio_source(song: Song, stream_url: str) -> discord.FFmpegOpusAudio:
+        ''' Spawns the FFmpeg process used to play a song's stream '''
 
-    @property
-    def queue(self) -> list[Song]:
-        ''' The current audio queue. '''
-        return self._data["queue"]
+        # Opus streams can be passed through to Discord as-is; anything else has to be re-encoded
+        if song.suffix == "opus":
+            return discord.FFmpegOpusAudio(stream_url, codec="opus", before_options=_FFMPEG_OPTIONS["before_options"], options="-vn")
+        return discord.FFmpegOpusAudio(stream_url, **_FFMPEG_OPTIONS)
 
-    @queue.setter
-    def queue(self, value: list) -> None:
-        self._data["queue"] = value
+    async def _prefetch_stream(self, current_song: Song, next_song: Song) -> None:
+        ''' Prepares the next song's stream shortly before the current song ends, so the next track can start without waiting on the API or FFmpeg '''
 
-    @property
-    def player_loop(self) -> asyncio.AbstractEventLoop:
-        ''' The player loop '''
-        return self._player_loop
-    
-    @player_loop.setter
-    def player_loop(self, loop: asyncio.AbstractEventLoop) -> None:
-        self._player_loop = loop
+        loop = asyncio.get_running_loop()
+        ends_at = loop.time() + current_song.duration
+
+        await asyncio.sleep(max(0, ends_at - _PREFETCH_LEAD_TIME - loop.time()))
+        try:
+            stream_url = await stream(next_song.song_id)
+        except (APIError, aiohttp.ClientError, asyncio.TimeoutError) as err:
+            logger.debug("Failed to prefetch stream for song %s: %s", next_song.song_id, err)
+            return
+
+        if not stream_url:
+            return
+
+        self._discard_prefetched_source()
+        prefetched = (next_song.song_id, stream_url, None, time.monotonic())
+        self._prefetched_source = prefetched
+
+        # Start FFmpeg just before the current song ends, so its process startup & stream probing overlap with the tail of it
+        await asyncio.sleep(max(0, ends_at - _FFMPEG_WARMUP_LEAD_TIME - loop.time()))
+        if self._prefetched_source is not prefetched:
+            return
+
+        try:
+            audio_src = self._create_audio_source(next_song, stream_url)
+        except discord.ClientException as err:
+            logger.debug("Failed to prepare audio source for song %s: %s", next_song.song_id, err)
+            return
+
+        self._prefetched_source = (next_song.song_id, stream_url, audio_src, prefetched[3])
+
+    def _take_prefetched_source(self, song: Song) -> discord.FFmpegOpusAudio | None:
+        ''' Returns an audio source for the given song from its prefetched stream if it's still fresh, consuming it '''
+
+        prefetched = self._prefetched_source
+        if prefetched is None:
+            return None
+
+        song_id, stream_url, audio_src, fetched_at = prefetched
+        if song_id != song.song_id or time.monotonic() - fetched_at > _PREFETCH_MAX_AGE:
+            self._discard_prefetched_source()
+            return None
+
+        self._prefetched_source = None
+        return audio_src or self._create_audio_source(song, stream_url)
 
+    def _discard_prefetched_source(self) -> None:
+        ''' Drops the prefetched stream, stopping its FFmpeg process if one was started '''
 
+        if self._prefetched_source is not None:
+            audio_src = self._prefetched_source[2]
+            self._prefetched_source = None
+            if audio_src is not None:
+                audio_src.cleanup()
 
+    def _cancel_prefetch(self) -> None:
+        ''' Cancels any pending stream prefetch '''
 
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+            self._prefetch_task = None
 
-    async def stream_track(self, interaction: discord.Interaction, song: Song, voice_client: discord.VoiceClient) -> None:
+    def stop(self) -> None:
+        ''' Stops playback without advancing the queue, putting the current song back at the front of it '''
+
+        self._stopped = True
+        self._cancel_prefetch()
+        self._discard_prefetched_source()
+
+        voice_client = self.voice_client
+        if voice_client is not None:
+            voice_client.stop()
+
+        if self.current_song is not None:
+            self.queue.appendleft(self.current_song)
+            self.current_song = None
+
+    async def stream_track(self, interaction: discord.Interaction, song: Song) -> None:
         ''' Streams a track from the Subsonic server to a connected voice channel, and updates guild data accordingly '''
 
+        voice_client = self.voice_client
+
         # Make sure the voice client is available and connected
         if voice_client is None:
             await ui.ErrMsg.bot_not_in_voice_channel(self.announce_channel)
@@ -85,34 +184,36 @@ class Player():
             await ui.ErrMsg.already_playing(interaction)
             return
 
-        # Get the stream from the Subsonic server, using the provided song's ID
-        ffmpeg_options = {"before_options": "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
-                           "options": "-filter:a volume=replaygain=track"}
+        # Get the stream from the Subsonic server, using the provided song's ID, unless it was already prepared
+        self._cancel_prefetch()
         try:
-            stream_url = await stream(song.song_id)
-            if not stream_url:
-                logger.error("Failed to get stream URL")
-                await ui.ErrMsg.msg(interaction, "Failed to get audio stream. Please try again.")
-                return
-                
-            audio_src = discord.FFmpegOpusAudio(stream_url, **ffmpeg_options)
+            audio_src = self._take_prefetched_source(song)
+            if audio_src is None:
+                stream_url = await stream(song.song_id)
+                if not stream_url:
+                    logger.error("Failed to get stream URL")
+                    await ui.ErrMsg.msg(interaction, "Failed to get audio stream. Please try again.")
+                    return
+
+                audio_src = self._create_audio_source(song, stream_url)
         except APIError as err:
-            logger.error(f"API Error streaming song, Code {err.errorcode}: {err.message}")
+            logger.error("API Error streaming song, Code %s: %s", err.errorcode, err.message)
             await ui.ErrMsg.msg(interaction, f"API error while streaming song: {err.message}")
             return
         except Exception as e:
-            logger.error(f"Unexpected error getting audio stream: {e}")
+            logger.error("Unexpected error getting audio stream: %s", e)
             await ui.ErrMsg.msg(interaction, "An error occurred while preparing the audio. Please try again.")
             return
 
         # Begin playing the song
-        loop = asyncio.get_event_loop()
-        self.player_loop = loop
+        if self.player_loop is None:
+            self.player_loop = asyncio.get_running_loop()
+        loop = self.player_loop
 
         # Handle playback finished
         async def playback_finished(error):
             if error:
-                logger.error(f"An error occurred while playing the audio: {error}")
+                logger.error("An error occurred while playing the audio: %s", error)
                 # Check if the error is related to voice connection
                 if "Not connected to voice" in str(error):
                     logger.warning("Voice connection was lost during playback")
@@ -120,24 +221,35 @@ class Player():
                     if interaction.user and interaction.user.voice and interaction.user.voice.channel:
                         try:
                             # Try to reconnect to the voice channel
+                            voice_client = self.voice_client
                             if voice_client and not voice_client.is_connected():
                                 await voice_client.connect(timeout=10.0, reconnect=True)
                                 logger.info("Successfully reconnected to voice channel")
                         except Exception as e:
-                            logger.error(f"Failed to reconnect to voice channel: {e}")
+                            logger.error("Failed to reconnect to voice channel: %s", e)
                 return
                 
             logger.debug("Playback finished.")
+
+            # Playback was stopped on purpose; wait for the queue to be started again
+            if self._stopped:
+                return
+
             try:
                 # Only proceed if voice client is still connected
+                voice_client = self.voice_client
                 if voice_client and voice_client.is_connected():
-                    future = asyncio.run_coroutine_threadsafe(self.play_audio_queue(interaction, voice_client), loop)
-                    # Add a callback to handle any exceptions that occur during execution
-                    future.add_done_callback(lambda f: logger.error(f"Error in play_audio_queue: {f.exception()}") if f.exception() else None)
+                    await self.play_audio_queue(interaction)
                 else:
                     logger.warning("Voice client disconnected, cannot continue queue playback")
             except Exception as e:
-                logger.error(f"Failed to schedule play_audio_queue: {e}")
+                logger.error("Error in play_audio_queue: %s", e)
+
+        # Called on the event loop once the voice client's audio thread reports the track has ended
+        def on_playback_end(error):
+            task = loop.create_task(playback_finished(error))
+            self._playback_tasks.add(task)
+            task.add_done_callback(self._playback_tasks.discard)
 
         # Try to play the audio with retry logic
         max_attempts = 3
@@ -148,21 +260,29 @@ class Player():
                 # Check again if voice client is still connected before playing
                 if not voice_client.is_connected():
                     logger.error("Voice client disconnected before playing")
+                    audio_src.cleanup()
                     await ui.ErrMsg.msg(interaction, "Voice connection was lost. Please try again.")
                     return
                     
-                voice_client.play(audio_src, after=lambda e: loop.create_task(playback_finished(e)))
-                logger.info(f"Started playing: {song.title} by {song.artist}")
+                voice_client.play(audio_src, after=lambda e: loop.call_soon_threadsafe(on_playback_end, e))
+                logger.info("Started playing: %s by %s", song.title, song.artist)
+
+                # Get the next song's stream ready ahead of time
+                if self.queue:
+                    self._prefetch_task = asyncio.create_task(self._prefetch_stream(song, self.queue[0]))
                 return  # Success, exit the function
             except discord.ClientException as e:
-                logger.error(f"Discord client exception while playing audio (attempt {attempt+1}): {e}")
+                logger.error("Discord client exception while playing audio (attempt %d): %s", attempt+1, e)
                 attempt += 1
                 if attempt >= max_attempts:
+                    audio_src.cleanup()
                     await ui.ErrMsg.msg(interaction, "Failed to play audio after multiple attempts. Please try again.")
                     return
-                await asyncio.sleep(1)  # Wait before retrying
+                # Back off exponentially before retrying, with a little jitter
+                await asyncio.sleep(min(0.1 * 2 ** (attempt - 1), 2.0) + random.random() * 0.1)
             except Exception as err:
-                logger.error(f"An error occurred while playing the audio: {err}")
+                logger.error("An error occurred while playing the audio: %s", err)
+                audio_src.cleanup()
                 await ui.ErrMsg.msg(interaction, "An error occurred while playing the audio. Please try again.")
                 return
 
@@ -171,33 +291,33 @@ class Player():
         ''' Handles populating the queue when autoplay is enabled '''
 
         autoplay_mode = data.guild_properties(interaction.guild_id).autoplay_mode
-        queue = data.guild_data(interaction.guild_id).player.queue
+        queue = self.queue
         logger.debug("Handling autoplay...")
-        logger.debug(f"Autoplay mode: {autoplay_mode}")
-        logger.debug(f"Queue: {queue}")
+        logger.debug("Autoplay mode: %s", autoplay_mode)
+        logger.debug("Queue: %s", queue)
         # If queue is notempty or autoplay is disabled, don't handle autoplay
-        if queue != [] or autoplay_mode is data.AutoplayMode.NONE:
+        if queue or autoplay_mode is data.AutoplayMode.NONE:
             return False
 
         # If there was no previous song provided, we default back to selecting a random song
         if prev_song_id is None:
             autoplay_mode = data.AutoplayMode.RANDOM
-            logging.info("No previous song ID provided. Defaulting to random.")
+            logger.info("No previous song ID provided. Defaulting to random.")
 
         songs = []
 
         try:
-            match autoplay_mode:
-                case data.AutoplayMode.RANDOM:
-                    songs = await get_random_songs(size=1)
-                case data.AutoplayMode.SIMILAR:
-                    logger.debug(f"Prev song ID: {prev_song_id}")
-                    songs = await get_similar_songs(song_id=prev_song_id, count=1)
+            logger.debug("Prev song ID: %s", prev_song_id)
+            fetcher = _autoplay_fetchers().get(autoplay_mode)
+            if fetcher is not None:
+                songs = await fetcher(prev_song_id)
+            else:
+                logger.error("No autoplay fetcher for autoplay mode %s", autoplay_mode)
 
         except APIError as err:
-            logging.error(f"API Error fetching song for autoplay, Code {err.errorcode}: {err.message}")
+            logger.error("API Error fetching song for autoplay, Code %s: %s", err.errorcode, err.message)
         
-        logger.debug(f"Autoplay song: {songs}")
+        logger.debug("Autoplay song: %s", songs)
 
         # If there's no match, throw an error
         if len(songs) == 0:
@@ -208,45 +328,54 @@ class Player():
         return True
 
 
-    async def play_audio_queue(self, interaction: discord.Interaction, voice_client: discord.VoiceClient) -> None:
+    async def play_audio_queue(self, interaction: discord.Interaction) -> None:
         ''' Plays the audio queue '''
 
+        voice_client = self.voice_client
+
         # Check if the bot is connected to a voice channel; it's the caller's responsibility to open a voice channel
         if voice_client is None:
             await ui.ErrMsg.bot_not_in_voice_channel(interaction)
             return
         
-        # Check if the bot is already playing something
-        if voice_client.is_playing():
-            return
+        # Serialize queue advancement, so a finished track and a command can't both pop the next song
+        async with self._queue_lock:
+            self._stopped = False
+
+            # Check if the bot is already playing something
+            if voice_client.is_playing():
+                return
 
+            # Check if the queue contains songs, topping it up through autoplay if it's empty
+            if not self.queue:
+                logger.debug("Queue is empty.")
+                logger.debug("Current song: %s", self.current_song)
+                if self.current_song is not None:
+                    prev_song_id = self.current_song.song_id
+                    self.current_song = None
+                else:
+                    prev_song_id = None
+
+                # If autoplay didn't add anything, playback has ended; we should let the user know
+                if not await self.handle_autoplay(interaction, prev_song_id=prev_song_id):
+                    # Nothing is left to play, so don't keep a prefetched stream open
+                    self._cancel_prefetch()
+                    self._discard_prefetched_source()
+                    await ui.SysMsg.playback_ended(self.announce_channel)
+                    return
 
-        # Check if the queue contains songs
-        if self.queue != []:
             # Pop the first item from the queue and stream the track
-            song = self.queue.pop(0)
+            song = self.queue.popleft()
             self.current_song = song
             await ui.SysMsg.now_playing(self.announce_channel, song)
-            await self.stream_track(interaction, song, voice_client)
-        else:
-            logger.debug("Queue is empty.")
-            logger.debug("Current song: %s", self.current_song)
-            if self.current_song is not None:
-                prev_song_id = self.current_song.song_id
-                self.current_song = None
-            else:
-                prev_song_id = None
-            # Handle autoplay if queue is empty
-            if await self.handle_autoplay(interaction, prev_song_id=prev_song_id):
-                await self.play_audio_queue(interaction, voice_client)
-                return
-            # If the queue is empty, playback has ended; we should let the user know
-            await ui.SysMsg.playback_ended(self.announce_channel)
+            await self.stream_track(interaction, song)
 
 
-    async def skip_track(self, interaction: discord.Interaction, voice_client: discord.VoiceClient) -> None:
+    async def skip_track(self, interaction: discord.Interaction) -> None:
         ''' Skips the current track and plays the next one in the queue '''
 
+        voice_client = self.voice_client
+
         # Check if the bot is connected to a voice channel; it's the caller's responsibility to open a voice channel
         if voice_client is None:
             await ui.ErrMsg.bot_not_in_voice_channel(interaction)
@@ -254,6 +383,7 @@ class Player():
         logger.debug("Skipping track...")
         # Check if the bot is already playing something
         if voice_client.is_playing():
+            self._cancel_prefetch()
             voice_client.stop()
             await ui.SysMsg.skipping(self.announce_channel)
         else:
@@ -1,11 +1,16 @@
 ''' For interfacing with the Subsonic API '''
 
+import asyncio
 import logging
 import os
+import random
+import tempfile
 import aiohttp
+import orjson
 
 from pathlib import Path
 
+from util import cache
 from util import env
 
 logger = logging.getLogger(__name__)
@@ -22,18 +27,29 @@ SUBSONIC_REQUEST_PARAMS = {
 
 globalsession = None
 
+# Maximum number of requests sent to the Subsonic API at once when fetching in bulk
+MAX_CONCURRENT_REQUESTS = 8
+
+# Number of similar songs fetched & cached per song, so repeated requests can still pick a different one
+SIMILAR_SONG_POOL_SIZE = 20
+
+# Seconds to remember the path of a cover art file before checking the cache directory & API again
+ALBUM_ART_CACHE_TTL = 3600
+
 async def get_session() -> aiohttp.ClientSession:
     ''' Get an aiohttp session '''
     global globalsession
     if globalsession is None:
-        globalsession = aiohttp.ClientSession()
+        # Keep connections to the Subsonic server alive between requests, so consecutive calls skip the TCP/TLS handshake
+        connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        globalsession = aiohttp.ClientSession(connector=connector)
     return globalsession
 
 async def close_session() -> None:
     ''' Close the aiohttp session '''
     global globalsession
     if globalsession is not None:
-        globalsession.close()
+        await globalsession.close()
         globalsession = None
 
 class APIError(Exception):
@@ -45,6 +61,10 @@ class APIError(Exception):
 
 class Song():
     ''' Object representing a song returned from the Subsonic API '''
+
+    # Songs are held in every guild's queue, so avoid giving each one its own __dict__
+    __slots__ = ("_id", "_title", "_album", "_artist", "_cover_id", "_duration", "_suffix", "_duration_printable", "_display_line", "_short_line")
+
     def __init__(self, json_object: dict) -> None:
         #! Other properties exist in the initial json response but are currently unused by Discodrome and thus aren't supported here
         self._id: str = json_object["id"] if "id" in json_object else ""
@@ -53,6 +73,39 @@ class Song():
         self._artist: str = json_object["artist"] if "artist" in json_object else "Unknown Artist"
         self._cover_id: str = json_object["coverArt"] if "coverArt" in json_object else ""
         self._duration: int = json_object["duration"] if "duration" in json_object else 0
+        # If the server transcodes the song, the stream is delivered in the transcoded format rather than the original one
+        self._suffix: str = json_object.get("transcodedSuffix") or json_object.get("suffix") or ""
+        self._compute_display_strings()
+
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: dict) -> None:
+        # Songs pickled by older versions may be missing newer fields, so fill them in on load
+        for name, value in state.items():
+            setattr(self, name, value)
+        if "_suffix" not in state:
+            self._suffix = ""
+        self._compute_display_strings()
+
+    def _compute_display_strings(self) -> None:
+        ''' Formats the strings used to display the song, so they aren't rebuilt every time they're shown '''
+
+        self._duration_printable: str = f"{(self._duration // 60):02d}:{(self._duration % 60):02d}"
+
+        # Truncate long titles, artists & albums so each search result fits on two lines
+        tr_title = self._title
+        tr_artist = self._artist
+        tr_album = (self._album[:68] + "...") if len(self._album) > 68 else self._album
+        top_str_length = len(self._title + " - " + self._artist)
+        if top_str_length > 71:
+            if len(tr_title) > len(tr_artist):
+                tr_title = self._title[:(68 - top_str_length)] + '...'
+            else:
+                tr_artist = self._artist[:(68 - top_str_length)] + '...'
+        self._display_line: str = f"**{tr_title}** - *{tr_artist}* \n*{tr_album}* ({self._duration_printable})"
+
+        self._short_line: str = f"**{self._title}** - *{self._artist}*\n{self._album} ({self._duration_printable})"
 
     @property
     def song_id(self) -> str:
@@ -87,7 +140,22 @@ class Song():
     @property
     def duration_printable(self) -> str:
         ''' The total duration of the song as a human readable string in the format `mm:ss` '''
-        return f"{(self._duration // 60):02d}:{(self._duration % 60):02d}"
+        return self._duration_printable
+
+    @property
+    def display_line(self) -> str:
+        ''' The song as a truncated, markdown formatted search result '''
+        return self._display_line
+
+    @property
+    def short_line(self) -> str:
+        ''' The song as a markdown formatted line for Now Playing & queue announcements '''
+        return self._short_line
+
+    @property
+    def suffix(self) -> str:
+        ''' The file extension of the song's audio stream, e.g. `mp3` or `opus` '''
+        return self._suffix
 
 class Album():
     ''' Object representing an album returned from subsonic API '''
@@ -201,7 +269,7 @@ async def ping_api() -> bool:
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/ping.view", params=SUBSONIC_REQUEST_PARAMS) as response:
         response.raise_for_status()
-        ping_data = await response.json()
+        ping_data = await response.json(loads=orjson.loads)
         if await check_subsonic_error(ping_data):
             return False
         logger.debug("Ping Response: %s", ping_data)
@@ -214,7 +282,7 @@ async def check_subsonic_error(response: dict[str, any]) -> bool:
     logging.debug("Checking for subsonic error...")
     if isinstance(response, aiohttp.ClientResponse):
         try:
-            response = await response.json()
+            response = await response.json(loads=orjson.loads)
         except Exception as e:
             return False
 
@@ -278,7 +346,7 @@ async def search(query: str, *, artist_count: int=00, artist_offset: int=0, albu
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/search3.view", params=params) as response:
         response.raise_for_status()
-        search_data = await response.json()
+        search_data = await response.json(loads=orjson.loads)
         if await check_subsonic_error(search_data):
             return []
         logger.debug("Search Response: %s", search_data)            
@@ -313,7 +381,7 @@ async def search_album(query: str) -> list[Album]:
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/search3.view", params=params) as response:
         response.raise_for_status()
-        search_data = await response.json()
+        search_data = await response.json(loads=orjson.loads)
         if await check_subsonic_error(search_data):
             return None
         try:
@@ -330,7 +398,7 @@ async def search_album(query: str) -> list[Album]:
 
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getAlbum.view", params=album_params) as response:
         response.raise_for_status()
-        search_data = await response.json()
+        search_data = await response.json(loads=orjson.loads)
         if await check_subsonic_error(search_data):
             return None
         logger.debug("Search Response: %s", search_data)
@@ -344,19 +412,24 @@ async def search_album(query: str) -> list[Album]:
     
     return album
 
-async def get_user_playlists() -> list[int]:
+async def get_user_playlists() -> list[dict]:
     ''' Retrive metadata of all playlists the Subsonic user is authorised to play '''
 
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getPlaylists.view", params=SUBSONIC_REQUEST_PARAMS) as response:
         response.raise_for_status()
-        query_data = await response.json()
+        query_data = await response.json(loads=orjson.loads)
         if await check_subsonic_error(query_data):
             return None
         logger.debug("Playlists query response: %s", query_data)
 
     playlists = query_data["subsonic-response"]["playlists"]["playlist"]
 
+    # Format each playlist's duration once here, rather than every time the list is displayed
+    for playlist in playlists:
+        duration = playlist["duration"] if "duration" in playlist else 0
+        playlist["duration_printable"] = f"{(duration // 60):02d}m {(duration % 60):02d}s"
+
     return playlists
 
 async def get_playlist(id: str) -> Playlist:
@@ -371,7 +444,7 @@ async def get_playlist(id: str) -> Playlist:
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getPlaylist.view", params=params) as response:
         response.raise_for_status()
-        playlist = await response.json()
+        playlist = await response.json(loads=orjson.loads)
         if await check_subsonic_error(playlist):
             return None
         logger.debug("Playlist query response: %s", playlist)
@@ -401,7 +474,7 @@ async def get_artist_id(query: str) -> str:
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/search3.view", params=params) as response:
         response.raise_for_status()
-        search_data = await response.json()
+        search_data = await response.json(loads=orjson.loads)
         if await check_subsonic_error(search_data):
             return None
         artistid = search_data["subsonic-response"]["searchResult3"]["artist"][0]["id"]
@@ -409,7 +482,7 @@ async def get_artist_id(query: str) -> str:
     
     return artistid
 
-async def get_artist_discography(query: str) -> Album:
+async def get_artist_discography(query: str) -> list[Album]:
     ''' Send a search request to the subsonic API to return all albums by an artist '''
 
     artistid = await get_artist_id(query)
@@ -423,34 +496,82 @@ async def get_artist_discography(query: str) -> Album:
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getArtist.view", params=artist_params) as response:
         response.raise_for_status()
-        search_data = await response.json()
+        search_data = await response.json(loads=orjson.loads)
         if await check_subsonic_error(search_data):
             return None
         logger.debug("Search Response: %s", search_data)
         albums = search_data["subsonic-response"]["artist"]["album"]
     
-    album_list : list[Album] = []
-
-    for albuminfo in albums:
-        albumid = albuminfo["id"]
-        album_params = {
-            "id": albumid
-        }
-        album_params = SUBSONIC_REQUEST_PARAMS | album_params
-        async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getAlbum.view", params=album_params) as response:
-            response.raise_for_status()
-            album = await response.json()
-            if await check_subsonic_error(album):
-                return None
-            logger.debug("Search Response: %s", album)
-            album = Album(album["subsonic-response"]["album"])
-            album_list.append(album)
+    return await get_albums([albuminfo["id"] for albuminfo in albums])
+
+async def get_albums(album_ids: list[str]) -> list[Album]:
+    ''' Retrieve several albums and all their songs, in the order their ids were given. Returns None if any album fails '''
+
+    # The Subsonic API has no multi-id getAlbum, so send the requests concurrently over our pooled session instead
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def fetch_album(album_id: str) -> Album:
+        async with semaphore:
+            return await get_album(album_id)
+
+    album_list: list[Album] = await asyncio.gather(*(fetch_album(album_id) for album_id in album_ids))
+    if None in album_list:
+        return None
 
     return album_list
 
+async def get_album(album_id: str) -> Album:
+    ''' Retrieve an album and all its songs '''
+
+    album_params = {
+        "id": album_id
+    }
+
+    params = SUBSONIC_REQUEST_PARAMS | album_params
+
+    session = await get_session()
+    async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getAlbum.view", params=params) as response:
+        response.raise_for_status()
+        album = await response.json(loads=orjson.loads)
+        if await check_subsonic_error(album):
+            return None
+        logger.debug("Search Response: %s", album)
+
+    return Album(album["subsonic-response"]["album"])
+
+
+def _write_cache_file(file: Path, contents: bytes) -> None:
+    ''' Write a file to the cache directory, creating it if needed '''
+    file.parent.mkdir(exist_ok=True, parents=True)
+
+    # Write to a temporary file first and move it into place, so the file never appears half written
+    fd, temp_path = tempfile.mkstemp(dir=file.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(contents)
+        os.replace(temp_path, file)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
 
 async def get_album_art_file(cover_id: str, size: int=300) -> str:
     ''' Request album art from the subsonic API '''
+    return await _get_cached_album_art_file(cover_id, size) or "resources/cover_not_found.jpg"
+
+async def get_album_art_files(cover_ids: list[str], size: int=300) -> list[str]:
+    ''' Request several pieces of album art at once, in the order their ids were given. Failed requests are returned as exceptions '''
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def fetch_cover(cover_id: str) -> str:
+        async with semaphore:
+            return await get_album_art_file(cover_id, size)
+
+    return await asyncio.gather(*(fetch_cover(cover_id) for cover_id in cover_ids), return_exceptions=True)
+
+@cache.async_ttl_cache(ALBUM_ART_CACHE_TTL, maxsize=512)
+async def _get_cached_album_art_file(cover_id: str, size: int) -> str:
+    ''' Returns the path to a song's album art, downloading it to the cache directory if needed. Returns None on failure '''
     target_path = f"cache/{cover_id}.jpg"
 
     # Check if the cover art is already cached (TODO: Check for last-modified date?)
@@ -468,11 +589,12 @@ async def get_album_art_file(cover_id: str, size: int=300) -> str:
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getCoverArt", params=params) as response:
         logging.debug("Response: %s", response.content)
         if await check_subsonic_error(response) or response.status != 200:
-            return "resources/cover_not_found.jpg"
+            return None
 
-        file = Path(target_path)
-        file.parent.mkdir(exist_ok=True, parents=True)
-        file.write_bytes(await response.read())
+        cover_bytes = await response.read()
+
+    # Write the cover art to disk in a worker thread so the event loop isn't blocked on file I/O
+    await asyncio.to_thread(_write_cache_file, Path(target_path), cover_bytes)
         
     return target_path
 
@@ -503,7 +625,7 @@ async def get_random_songs(size: int=None, genre: str=None, from_year: int=None,
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getRandomSongs.view", params=params) as response:
         response.raise_for_status()
-        search_data = await response.json()
+        search_data = await response.json(loads=orjson.loads)
         if await check_subsonic_error(search_data):
             return []
         logger.debug("Search Response: %s", search_data)
@@ -515,7 +637,7 @@ async def get_random_songs(size: int=None, genre: str=None, from_year: int=None,
     return results
 
 async def get_similar_songs(song_id: str, count: int=1) -> list[Song]:
-    ''' Request similar songs from the subsonic API '''
+    ''' Request similar songs from the subsonic API, picked at random from a cached pool of similar songs '''
 
     logger.debug("Requesting similar song...")
     logger.debug("Song id: %s", song_id)
@@ -523,6 +645,23 @@ async def get_similar_songs(song_id: str, count: int=1) -> list[Song]:
     if song_id is None:
         return []
 
+    # Requests larger than the pool can't be served from it
+    if count > SIMILAR_SONG_POOL_SIZE:
+        return await _fetch_similar_songs(song_id, count) or []
+
+    pool = await _get_similar_song_pool(song_id)
+    if not pool:
+        return []
+    return random.sample(pool, min(count, len(pool)))
+
+@cache.async_ttl_cache(600, maxsize=256)
+async def _get_similar_song_pool(song_id: str) -> list[Song]:
+    ''' Returns a pool of songs similar to the given song, or None if the request failed '''
+    return await _fetch_similar_songs(song_id, SIMILAR_SONG_POOL_SIZE)
+
+async def _fetch_similar_songs(song_id: str, count: int) -> list[Song]:
+    ''' Request similar songs from the subsonic API, returning None if the request failed '''
+
     search_params = {
         "id": song_id,
         "count": count
@@ -533,17 +672,17 @@ async def get_similar_songs(song_id: str, count: int=1) -> list[Song]:
     session = await get_session()
     async with await session.get(f"{env.SUBSONIC_SERVER}/rest/getSimilarSongs.view", params=params) as response:
         response.raise_for_status()
-        search_data = await response.json()
+        search_data = await response.json(loads=orjson.loads)
         logging.debug("Json Response: %s", search_data)
         subsonic_error = await check_subsonic_error(search_data)
         logger.debug("Subsonic error: %s", subsonic_error)
         if subsonic_error:
-            logger.debug("Subsonic error. Returning empty list.")
-            return []
+            logger.debug("Subsonic error. Returning None.")
+            return None
 
     results: list[Song] = []
     
-    if search_data["subsonic-response"]["similarSongs"] == {}:
+    if not search_data["subsonic-response"]["similarSongs"]:
         logging.debug("No similar songs found. Returning empty list.")
         return []
     
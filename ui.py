@@ -1,11 +1,67 @@
 import discord
+import functools
+import io
 import logging
 import asyncio
-from subsonic import Song, Album, Playlist, get_album_art_file
+from subsonic import Song, Album, Playlist, get_album_art_file, get_album_art_files
 
 logger = logging.getLogger(__name__)
 
+# References to fire-and-forget tasks, so they aren't garbage collected before they finish
+_background_tasks: set[asyncio.Task] = set()
+
+@functools.lru_cache(maxsize=256)
+def _load_thumbnail(path: str) -> bytes:
+    ''' Reads a thumbnail image from disk, keeping recently used images in memory '''
+    with open(path, "rb") as file:
+        return file.read()
+
 class SysMsg:
+    @staticmethod
+    def _build(header: str, message: str = None, thumbnail: str = None) -> tuple[discord.Embed, dict]:
+        ''' Builds an embed, along with the keyword arguments needed to attach its thumbnail when sending '''
+        embed = discord.Embed(color=discord.Color(0x50C470), title=header, description=message)
+        if not thumbnail:
+            return embed, {}
+
+        try:
+            # discord.py consumes the stream when sending, so wrap the cached bytes in a fresh one each time
+            file = discord.File(io.BytesIO(_load_thumbnail(thumbnail)), filename="image.png")
+            embed.set_thumbnail(url="attachment://image.png")
+            return embed, {"file": file}
+        except Exception as e:
+            logger.error("Failed to attach thumbnail: %s", e)
+            return embed, {}
+
+    @staticmethod
+    async def _send_interaction(interaction: discord.Interaction,
+                                header: str,
+                                message: str = None,
+                                thumbnail: str = None,
+                                *,
+                                ephemeral: bool = False) -> None:
+        ''' Replies to a fresh interaction (only for immediate command replies) '''
+        if interaction.is_expired():
+            return
+
+        embed, attachment = __class__._build(header, message, thumbnail)
+        try:
+            if not interaction.response.is_done():
+                await interaction.response.send_message(embed=embed, ephemeral=ephemeral, **attachment)
+            else:
+                await interaction.followup.send(embed=embed, ephemeral=ephemeral, **attachment)
+        except:
+            pass
+
+    @staticmethod
+    async def _send_channel(channel: discord.TextChannel, header: str, message: str = None, thumbnail: str = None) -> None:
+        ''' Sends to a stored text channel (background announcements such as Now Playing) '''
+        embed, attachment = __class__._build(header, message, thumbnail)
+        try:
+            await channel.send(embed=embed, **attachment)
+        except:
+            pass
+
     @staticmethod
     async def msg(channel_or_interaction,
                   header: str,
@@ -13,89 +69,74 @@ class SysMsg:
                   thumbnail: str = None,
                   *,
                   ephemeral: bool = False) -> None:
-        embed = discord.Embed(color=discord.Color(0x50C470), title=header, description=message)
-        file = discord.utils.MISSING
-        if thumbnail:
-            try:
-                file = discord.File(thumbnail, filename="image.png")
-                embed.set_thumbnail(url="attachment://image.png")
-            except Exception as e:
-                logger.error(f"Failed to attach thumbnail: {e}")
-
-        # Fresh interaction → use response/followup (only for immediate command replies)
-        if isinstance(channel_or_interaction, discord.Interaction) and not channel_or_interaction.is_expired():
-            try:
-                if not channel_or_interaction.response.is_done():
-                    await channel_or_interaction.response.send_message(embed=embed, file=file, ephemeral=ephemeral)
-                else:
-                    await channel_or_interaction.followup.send(embed=embed, file=file, ephemeral=ephemeral)
-                return
-            except:
-                pass  # fall through
-
-        # Stored text channel → background announcements (Now Playing, etc.)
-        if isinstance(channel_or_interaction, discord.TextChannel):
-            try:
-                await channel_or_interaction.send(embed=embed, file=file)
-            except:
-                pass
+        if isinstance(channel_or_interaction, discord.Interaction):
+            await __class__._send_interaction(channel_or_interaction, header, message, thumbnail, ephemeral=ephemeral)
+        elif isinstance(channel_or_interaction, discord.TextChannel):
+            await __class__._send_channel(channel_or_interaction, header, message, thumbnail)
 
     # ───── Background announcements (called from player) ─────
     @staticmethod
     async def now_playing(channel: discord.TextChannel | None, song: Song) -> None:
         if not channel: return
         cover_art = await get_album_art_file(song.cover_id)
-        desc = f"**{song.title}** - *{song.artist}*\n{song.album} ({song.duration_printable})"
-        await __class__.msg(channel, "Now Playing:", desc, cover_art)
+        desc = song.short_line
+        await __class__._send_channel(channel, "Now Playing:", desc, cover_art)
 
     @staticmethod
     async def playback_ended(channel: discord.TextChannel | None) -> None:
-        if channel: await __class__.msg(channel, "Playback ended")
+        if channel: await __class__._send_channel(channel, "Playback ended")
 
     @staticmethod
     async def skipping(channel: discord.TextChannel | None) -> None:
-        if channel: await __class__.msg(channel, "Skipped track")
+        if channel: await __class__._send_channel(channel, "Skipped track")
 
     # ───── Immediate command responses (interaction still valid) ─────
     @staticmethod
     async def added_to_queue(interaction: discord.Interaction, song: Song) -> None:
-        desc = f"**{song.title}** - *{song.artist}*\n{song.album} ({song.duration_printable})"
+        desc = song.short_line
         cover_art = await get_album_art_file(song.cover_id)
-        await __class__.msg(interaction, f"{interaction.user.display_name} added track to queue", desc, cover_art)
+        await __class__._send_interaction(interaction, f"{interaction.user.display_name} added track to queue", desc, cover_art)
 
     @staticmethod
     async def added_album_to_queue(interaction: discord.Interaction, album: Album) -> None:
         desc = f"**{album.name}** - *{album.artist}*\n{album.song_count} songs ({album.duration} seconds)"
         cover_art = await get_album_art_file(album.cover_id)
-        await __class__.msg(interaction, f"{interaction.user.display_name} added album to queue", desc, cover_art)
+        await __class__._send_interaction(interaction, f"{interaction.user.display_name} added album to queue", desc, cover_art)
 
     @staticmethod
     async def added_playlist_to_queue(interaction: discord.Interaction, playlist: Playlist) -> None:
         desc = f"**{playlist.name}**\n{playlist.song_count} songs ({playlist.duration} seconds)"
         cover_art = await get_album_art_file(playlist.cover_id)
-        await __class__.msg(interaction, f"{interaction.user.display_name} added playlist to queue", desc, cover_art)
+        await __class__._send_interaction(interaction, f"{interaction.user.display_name} added playlist to queue", desc, cover_art)
 
     @staticmethod
     async def added_discography_to_queue(interaction: discord.Interaction, artist: str, albums: list[Album]) -> None:
-        desc = f"**{artist}** — {len(albums)} albums\n\n"
         cover_art = await get_album_art_file(albums[0].cover_id) if albums else None
-        for i, album in enumerate(albums):
-            desc += f"**{i+1}. {album.name}** — {album.song_count} songs\n"
+
+        # Warm the cover art cache for the remaining albums in the background, ready for their Now Playing announcements
+        if len(albums) > 1:
+            task = asyncio.create_task(get_album_art_files([album.cover_id for album in albums[1:]]))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+        lines = [f"**{artist}** — {len(albums)} albums\n"]
+        lines.extend(f"**{i+1}. {album.name}** — {album.song_count} songs" for i, album in enumerate(albums))
+        desc = "\n".join(lines) + "\n"
         if len(desc) > 4000:
             desc = desc[:3990] + "..."
-        await __class__.msg(interaction, f"{interaction.user.display_name} added discography to queue", desc, cover_art)
+        await __class__._send_interaction(interaction, f"{interaction.user.display_name} added discography to queue", desc, cover_art)
 
     @staticmethod
     async def queue_cleared(interaction: discord.Interaction) -> None:
-        await __class__.msg(interaction, f"{interaction.user.display_name} cleared the queue")
+        await __class__._send_interaction(interaction, f"{interaction.user.display_name} cleared the queue")
 
     @staticmethod
     async def starting_queue_playback(interaction: discord.Interaction) -> None:
-        await __class__.msg(interaction, "Started queue playback")
+        await __class__._send_interaction(interaction, "Started queue playback")
 
     @staticmethod
     async def stopping_queue_playback(interaction: discord.Interaction) -> None:
-        await __class__.msg(interaction, "Stopped queue playback")
+        await __class__._send_interaction(interaction, "Stopped queue playback")
 
 
 class ErrMsg:
@@ -152,19 +193,9 @@ class ErrMsg:
 
 # ───── Rest of your file (unchanged) ─────
 def parse_search_as_track_selection_embed(results: list[Song], query: str, page_num: int) -> discord.Embed:
-    options_str = ""
-    for song in results:
-        tr_title = song.title
-        tr_artist = song.artist
-        tr_album = (song.album[:68] + "...") if len(song.album) > 68 else song.album
-        top_str_length = len(song.title + " - " + song.artist)
-        if top_str_length > 71:
-            if len(tr_title) > len(tr_artist):
-                tr_title = song.title[:(68 - top_str_length)] + '...'
-            else:
-                tr_artist = song.artist[:(68 - top_str_length)] + '...'
-        options_str += f"**{tr_title}** - *{tr_artist}* \n*{tr_album}* ({song.duration_printable})\n\n"
-    options_str += f"Current page: {page_num}"
+    parts = [song.display_line for song in results]
+    parts.append(f"Current page: {page_num}")
+    options_str = "\n\n".join(parts)
     return discord.Embed(color=discord.Color.orange(), title=f"Results for: {query}", description=options_str)
 
 def parse_search_as_track_selection_options(results: list[Song]) -> list[discord.SelectOption]:
@@ -0,0 +1,56 @@
+'''Collection of utility functions related to caching.'''
+
+import functools
+import time
+
+from typing import Any, Awaitable, Callable, Hashable
+
+
+def async_ttl_cache(ttl: float, *, key: Callable[..., Hashable]=None, maxsize: int=None, cleanup_interval: float=60) -> Callable:
+    '''Decorator that caches the results of a coroutine function for `ttl` seconds, keyed by its arguments.
+
+    Results of `None` are never cached, so failed lookups are retried on the next call.
+    If `maxsize` is given, the least recently used entry is evicted once the cache grows past it.
+    Expired entries are swept at most once every `cleanup_interval` seconds, whenever the cache is accessed.
+    '''
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        cache: dict[Hashable, tuple[float, Any]] = {}
+        next_cleanup = 0.0
+
+        def make_key(*args, **kwargs) -> Hashable:
+            if key is not None:
+                return key(*args, **kwargs)
+            return (args, tuple(sorted(kwargs.items())))
+
+        def cleanup(now: float) -> None:
+            nonlocal next_cleanup
+            if now < next_cleanup:
+                return
+            for cache_key in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+                del cache[cache_key]
+            next_cleanup = now + cleanup_interval
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> Any:
+            now = time.monotonic()
+            cleanup(now)
+
+            cache_key = make_key(*args, **kwargs)
+            entry = cache.pop(cache_key, None)
+            if entry is not None and entry[0] > now:
+                # Re-insert the entry to mark it as the most recently used
+                cache[cache_key] = entry
+                return entry[1]
+
+            value = await func(*args, **kwargs)
+            if value is not None:
+                cache[cache_key] = (time.monotonic() + ttl, value)
+                if maxsize is not None and len(cache) > maxsize:
+                    del cache[next(iter(cache))]
+            return value
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator